@@ -1,84 +1,391 @@
+import asyncio
+import base64
 import os
-import json
-import subprocess
-import glob
-from datetime import datetime
-from pathlib import Path
+import threading
+from collections import OrderedDict
+from operator import itemgetter
 from typing import Dict, Any, List
+import orjson
+import aiofiles
 import aiohttp
 import sqlite3
-import pandas as pd
-from PIL import Image
-import numpy as np
 import re
-import markdown2
-import requests
-import git
-from io import BytesIO
+
+# pandas, PIL, numpy and markdown2 are imported inside the handlers that
+# use them: together they add ~500 ms and >100 MB RSS at import time, and
+# most deployments never touch every handler
+
+# Static instruction prefixes kept byte-identical across calls so providers
+# with prompt/prefix caching can reuse the precomputed KV state
+EXTRACT_API_PROMPT = (
+    "You extract the API URL(s) and request parameters from a task description. "
+    "Respond with a JSON object of the form {\"url\": \"...\", \"params\": {...}}, "
+    "or {\"urls\": [\"...\"], \"params\": {...}} when the task names several URLs or pages."
+)
+EXTRACT_GIT_PROMPT = (
+    "You extract the git repository URL and commit message from a task description. "
+    "Respond with a JSON object of the form {\"url\": \"...\", \"commit_message\": \"...\"}."
+)
+EXTRACT_CSV_PROMPT = (
+    "You extract the CSV file path, filter column and filter value from a task description. "
+    "Respond with a JSON object of the form {\"file\": \"...\", \"column\": \"...\", \"value\": \"...\"}."
+)
+EXTRACT_IMAGE_PROMPT = (
+    "You extract the image file path and target size from a task description. "
+    "Respond with a JSON object of the form {\"file\": \"...\", \"width\": 800, \"height\": 800}."
+)
+
+# Extraction patterns, compiled once at import instead of per call
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+FROM_RE = re.compile(
+    r"^From:.*?([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})", re.M | re.I
+)
+CC_RE = re.compile(r"\b(?:\d[ -]?){13,16}\b")
+NON_DIGIT_RE = re.compile(r"\D")
+H1_RE = re.compile(r"^# (.+)$", re.M)
+MD_PATH_RE = re.compile(r"/data/\S+\.md\b")
+
+# Literal slots recognized by the extraction template cache
+_URL_RE = re.compile(r"https?://\S+")
+_QUOTED_RE = re.compile(r"\"([^\"]*)\"|'([^']*)'")
+
+def _normalize_task(task: str) -> tuple:
+    """Replace URL and quoted-string literals with numbered placeholders.
+
+    Returns the template plus a placeholder -> literal map, so tasks that
+    differ only in their literals share one template key.
+    """
+    slots: Dict[str, str] = {}
+
+    def repl_url(match):
+        # Trailing punctuation belongs to the sentence, not the URL; keep
+        # it out of the slot so the literal matches what the LLM returns
+        url = match.group()
+        trailing = ''
+        while url and url[-1] in '.,;:!?)]}\'"':
+            trailing = url[-1] + trailing
+            url = url[:-1]
+        name = f"<URL{len(slots) + 1}>"
+        slots[name] = url
+        return name + trailing
+
+    def repl_str(match):
+        name = f"<STR{len(slots) + 1}>"
+        slots[name] = match.group(1) if match.group(1) is not None else match.group(2)
+        return name
+
+    template = _QUOTED_RE.sub(repl_str, _URL_RE.sub(repl_url, task))
+    return template, slots
+
+def _mask_slots(value: Any, slots: Dict[str, str]) -> Any:
+    """Swap literals back to their placeholders throughout a parsed result."""
+    if isinstance(value, str):
+        # Longest literal first so substrings don't clobber larger matches
+        for name, literal in sorted(slots.items(), key=lambda kv: len(kv[1]), reverse=True):
+            value = value.replace(literal, name)
+        return value
+    if isinstance(value, dict):
+        return {k: _mask_slots(v, slots) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_mask_slots(v, slots) for v in value]
+    return value
+
+def _fill_slots(value: Any, slots: Dict[str, str]) -> Any:
+    """Re-inject literals into a cached template parse."""
+    if isinstance(value, str):
+        for name, literal in slots.items():
+            value = value.replace(name, literal)
+        return value
+    if isinstance(value, dict):
+        return {k: _fill_slots(v, slots) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill_slots(v, slots) for v in value]
+    return value
+
+def _first_json_object(text: str) -> Any:
+    """Parse the first complete top-level JSON object embedded in text."""
+    start = text.find('{')
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if escape:
+            escape = False
+        elif ch == '\\':
+            escape = in_string
+        elif ch == '"':
+            in_string = not in_string
+        elif not in_string:
+            if ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    try:
+                        return orjson.loads(text[start:i + 1])
+                    except orjson.JSONDecodeError:
+                        return None
+    return None
+
+def _luhn_valid(digits: str) -> bool:
+    """Luhn checksum used to reject false-positive card numbers."""
+    if not 13 <= len(digits) <= 16:
+        return False
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+# Long-lived prettier worker: loads node+prettier once and formats files
+# sent as JSON lines on stdin, replying one JSON line per request
+_PRETTIER_WORKER_JS = """
+const prettier = require('prettier');
+const fs = require('fs');
+const readline = require('readline');
+const rl = readline.createInterface({ input: process.stdin });
+rl.on('line', async (line) => {
+  const req = JSON.parse(line);
+  try {
+    const source = fs.readFileSync(req.file, 'utf8');
+    const formatted = await prettier.format(source, { filepath: req.file });
+    fs.writeFileSync(req.file, formatted);
+    process.stdout.write(JSON.stringify({ ok: true }) + '\\n');
+  } catch (err) {
+    process.stdout.write(JSON.stringify({ ok: false, error: String(err) }) + '\\n');
+  }
+});
+"""
+
+# Routing table: first rule whose keyword groups are all matched wins.
+# Each group is satisfied by any one of its keywords; order preserves the
+# original if/elif precedence (Phase A before Phase B).
+_ROUTES = [
+    ((("install uv", "datagen"),), "_handle_uv_installation"),
+    ((("format",), ("prettier",)), "_handle_prettier_formatting"),
+    ((("wednesday", "thursday", "sunday"),), "_handle_date_counting"),
+    ((("sort",), ("contacts",)), "_handle_json_sorting"),
+    ((("log",), ("recent",)), "_handle_log_processing"),
+    ((("markdown",), ("h1",)), "_handle_markdown_index"),
+    ((("email",), ("sender",)), "_handle_email_extraction"),
+    ((("credit",), ("card",)), "_handle_credit_card_extraction"),
+    ((("similar",), ("comments",)), "_handle_comment_similarity"),
+    ((("sqlite", "database", "ticket"),), "_handle_database_query"),
+    ((("api",), ("fetch",)), "_handle_api_fetch"),
+    ((("git",),), "_handle_git_operations"),
+    ((("sql",),), "_handle_sql_query"),
+    ((("scrape", "extract"),), "_handle_web_scraping"),
+    ((("image",),), "_handle_image_processing"),
+    ((("audio", "mp3"),), "_handle_audio_processing"),
+    ((("markdown",), ("html",)), "_handle_markdown_conversion"),
+    ((("csv",), ("filter",)), "_handle_csv_filtering"),
+]
+
+# Weekday numbers matching datetime.weekday() (Monday=0)
+_WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6
+}
+
+# One compiled alternation scans all routing keywords in a single pass.
+# Longest-first ordering plus the lookahead keeps overlapping keywords
+# (e.g. "sql" inside "sqlite") behaving like the old substring checks.
+_KEYWORD_RE = re.compile(
+    "(?=(" + "|".join(
+        re.escape(keyword)
+        for keyword in sorted(
+            {kw for groups, _ in _ROUTES for group in groups for kw in group},
+            key=len, reverse=True
+        )
+    ) + "))"
+)
 
 class TaskAgent:
     def __init__(self):
         self.ai_proxy_token = os.environ.get("AIPROXY_TOKEN")
         if not self.ai_proxy_token:
             raise ValueError("AIPROXY_TOKEN environment variable is required")
-        
+
+        # Shared HTTP session, created on startup so connections are reused
+        self._session: aiohttp.ClientSession | None = None
+
+        # Persistent prettier worker, started lazily on first use; the lock
+        # keeps concurrent requests from interleaving on its pipes
+        self._prettier_proc: asyncio.subprocess.Process | None = None
+        self._prettier_lock = asyncio.Lock()
+
+        # Pooled SQLite connections, one per database path
+        self._sqlite_conns: Dict[str, sqlite3.Connection] = {}
+        self._sqlite_lock = threading.Lock()
+
         # Ensure data directory exists
         os.makedirs('/data', exist_ok=True)
 
+        # Resolved once; the trailing separator stops /datax from passing
+        self._data_root = os.path.realpath('/data') + os.sep
+
+        # LRU cache of LLM responses, persisted so restarts retain hits
+        self._llm_cache: OrderedDict[str, str] = OrderedDict()
+        self._llm_cache_limit = 10000
+        self._llm_cache_path = '/data/.llm_cache.sqlite'
+        self._load_llm_cache()
+
+    def _load_llm_cache(self):
+        """Load previously cached LLM responses and template parses from disk."""
+        self._template_cache: Dict[str, bytes] = {}
+        try:
+            conn = sqlite3.connect(self._llm_cache_path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (prompt TEXT PRIMARY KEY, response TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS template_cache (key TEXT PRIMARY KEY, parsed TEXT)"
+            )
+            for prompt, response in conn.execute("SELECT prompt, response FROM llm_cache"):
+                self._llm_cache[prompt] = response
+            for key, parsed in conn.execute("SELECT key, parsed FROM template_cache"):
+                self._template_cache[key] = parsed.encode()
+            conn.close()
+        except Exception:
+            # Cache is an optimization only; never fail startup over it
+            self._llm_cache = OrderedDict()
+
+    def _store_template_parse(self, key: str, parsed: bytes):
+        """Persist a masked extraction parse for template-level reuse."""
+        self._template_cache[key] = parsed
+        try:
+            conn = sqlite3.connect(self._llm_cache_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO template_cache (key, parsed) VALUES (?, ?)",
+                (key, parsed.decode())
+            )
+            conn.commit()
+            conn.close()
+        except Exception:
+            pass
+
+    async def _extract_cached(self, task_description: str, system: str) -> Any:
+        """Extraction with a template cache.
+
+        Tasks that differ only in URL or quoted literals normalize to the
+        same template; on a hit the stored parse is reused with the new
+        literals re-injected, skipping the LLM invocation entirely.
+        """
+        template, slots = _normalize_task(task_description)
+        key = f"{system}\x00{template}"
+        cached = self._template_cache.get(key)
+        if cached is not None:
+            return _fill_slots(orjson.loads(cached), slots)
+
+        info = await self._handle_llm_request(task_description, system=system, parse_json=True)
+        if info is not None and slots:
+            masked = orjson.dumps(_mask_slots(info, slots))
+            text = masked.decode()
+            # Only cache when every literal was actually swapped for its
+            # placeholder - a parse with a raw literal left in it would be
+            # replayed verbatim for unrelated tasks
+            if all(name in text for name in slots) and not any(
+                literal in text for literal in slots.values()
+            ):
+                self._store_template_parse(key, masked)
+        return info
+
+    def _store_llm_response(self, prompt: str, response: str):
+        """Insert a response into the in-memory cache and persist it."""
+        self._llm_cache[prompt] = response
+        self._llm_cache.move_to_end(prompt)
+        evicted = None
+        if len(self._llm_cache) > self._llm_cache_limit:
+            evicted, _ = self._llm_cache.popitem(last=False)
+        try:
+            conn = sqlite3.connect(self._llm_cache_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (prompt, response) VALUES (?, ?)",
+                (prompt, response)
+            )
+            if evicted is not None:
+                conn.execute("DELETE FROM llm_cache WHERE prompt = ?", (evicted,))
+            conn.commit()
+            conn.close()
+        except Exception:
+            pass
+
+    async def startup(self):
+        """Create the shared HTTP session used for all outbound requests."""
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=200,
+                limit_per_host=50,
+                keepalive_timeout=30,
+                ttl_dns_cache=300
+            )
+        )
+
+    async def shutdown(self):
+        """Close the shared HTTP session and stop the prettier worker."""
+        if self._session:
+            await self._session.close()
+            self._session = None
+        if self._prettier_proc and self._prettier_proc.returncode is None:
+            self._prettier_proc.terminate()
+            await self._prettier_proc.wait()
+        self._prettier_proc = None
+        for conn in self._sqlite_conns.values():
+            conn.close()
+        self._sqlite_conns.clear()
+
+    def _sqlite_connection(self, db_path: str) -> sqlite3.Connection:
+        """Return the pooled connection for db_path, opening it on first use."""
+        # Get-or-open is atomic under the lock: concurrent workers must not
+        # both miss the pool and leak a duplicate connection
+        with self._sqlite_lock:
+            conn = self._sqlite_conns.get(db_path)
+            if conn is None:
+                conn = sqlite3.connect(db_path, check_same_thread=False)
+                # WAL + NORMAL skip the fsync-per-commit of rollback journals;
+                # mmap serves hot pages straight from the OS page cache
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA mmap_size=268435456")
+                self._sqlite_conns[db_path] = conn
+            return conn
+
+    async def _prettier_worker(self) -> asyncio.subprocess.Process:
+        """Return the persistent prettier worker, starting it if needed."""
+        if self._prettier_proc is None or self._prettier_proc.returncode is not None:
+            self._prettier_proc = await asyncio.create_subprocess_exec(
+                'node', '-e', _PRETTIER_WORKER_JS,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                env={**os.environ, 'NODE_PATH': '/usr/lib/node_modules'}
+            )
+        return self._prettier_proc
+
     def _validate_path(self, path: str) -> bool:
         """Validate path is within /data directory."""
         try:
-            full_path = os.path.abspath(path)
-            data_dir = os.path.abspath('/data')
-            return full_path.startswith(data_dir)
+            real = os.path.realpath(path)
+            return real == self._data_root[:-1] or real.startswith(self._data_root)
         except:
             return False
 
     async def execute_task(self, task_description: str) -> Dict[str, Any]:
         """Execute a task based on its description."""
         try:
-            # Phase A Tasks
-            if any(word in task_description.lower() for word in ["install uv", "datagen"]):
-                return await self._handle_uv_installation(task_description)
-            elif "format" in task_description.lower() and "prettier" in task_description.lower():
-                return await self._handle_prettier_formatting(task_description)
-            elif any(word in task_description.lower() for word in ["wednesday", "thursday", "sunday"]):
-                return await self._handle_date_counting(task_description)
-            elif "sort" in task_description.lower() and "contacts" in task_description.lower():
-                return await self._handle_json_sorting(task_description)
-            elif "log" in task_description.lower() and "recent" in task_description.lower():
-                return await self._handle_log_processing(task_description)
-            elif "markdown" in task_description.lower() and "h1" in task_description.lower():
-                return await self._handle_markdown_index(task_description)
-            elif "email" in task_description.lower() and "sender" in task_description.lower():
-                return await self._handle_email_extraction(task_description)
-            elif "credit" in task_description.lower() and "card" in task_description.lower():
-                return await self._handle_credit_card_extraction(task_description)
-            elif "similar" in task_description.lower() and "comments" in task_description.lower():
-                return await self._handle_comment_similarity(task_description)
-            elif any(word in task_description.lower() for word in ["sqlite", "database", "ticket"]):
-                return await self._handle_database_query(task_description)
-            
-            # Phase B Tasks
-            elif "api" in task_description.lower() and "fetch" in task_description.lower():
-                return await self._handle_api_fetch(task_description)
-            elif "git" in task_description.lower():
-                return await self._handle_git_operations(task_description)
-            elif "sql" in task_description.lower():
-                return await self._handle_sql_query(task_description)
-            elif "scrape" in task_description.lower() or "extract" in task_description.lower():
-                return await self._handle_web_scraping(task_description)
-            elif "image" in task_description.lower():
-                return await self._handle_image_processing(task_description)
-            elif "audio" in task_description.lower() or "mp3" in task_description.lower():
-                return await self._handle_audio_processing(task_description)
-            elif "markdown" in task_description.lower() and "html" in task_description.lower():
-                return await self._handle_markdown_conversion(task_description)
-            elif "csv" in task_description.lower() and "filter" in task_description.lower():
-                return await self._handle_csv_filtering(task_description)
-            else:
-                return {"status": "error", "message": "Task type not recognized"}
-                
+            # Lowercase once and collect all routing keywords in one scan
+            matched = set(_KEYWORD_RE.findall(task_description.lower()))
+            for groups, handler_name in _ROUTES:
+                if all(matched.intersection(group) for group in groups):
+                    return await getattr(self, handler_name)(task_description)
+            return {"status": "error", "message": "Task type not recognized"}
+
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
@@ -87,17 +394,22 @@ class TaskAgent:
         """A1: Install uv and run datagen.py"""
         try:
             # Install uv
-            subprocess.run(['curl', '-LsSf', 'https://astral.sh/uv/install.sh', '|', 'sh'], shell=True, check=True)
-            
+            proc = await asyncio.create_subprocess_shell('curl -LsSf https://astral.sh/uv/install.sh | sh')
+            if await proc.wait() != 0:
+                raise RuntimeError("uv installation failed")
+
             # Download and run datagen.py
             script_url = "https://raw.githubusercontent.com/sanand0/tools-in-data-science-public/tds-2025-01/project-1/datagen.py"
             email = os.environ.get("USER_EMAIL", "default@example.com")
-            
-            response = requests.get(script_url)
-            with open("datagen.py", "w") as f:
-                f.write(response.text)
-            
-            subprocess.run(['python', 'datagen.py', email], check=True)
+
+            async with self._session.get(script_url) as response:
+                script_text = await response.text()
+            async with aiofiles.open("datagen.py", "w") as f:
+                await f.write(script_text)
+
+            proc = await asyncio.create_subprocess_exec('python', 'datagen.py', email)
+            if await proc.wait() != 0:
+                raise RuntimeError("datagen.py failed")
             return {"status": "success", "message": "UV installed and datagen.py executed"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -106,73 +418,500 @@ class TaskAgent:
         """A2: Format markdown with prettier"""
         try:
             input_file = "/data/format.md"
-            subprocess.run(['prettier', '--write', input_file], check=True)
+            try:
+                # Reuse the warm worker - skips node's ~200 ms cold start.
+                # Hold the lock for the full round trip so concurrent
+                # requests can't cross replies on the shared pipes
+                async with self._prettier_lock:
+                    proc = await self._prettier_worker()
+                    proc.stdin.write(orjson.dumps({"file": input_file}) + b'\n')
+                    await proc.stdin.drain()
+                    reply = orjson.loads(await proc.stdout.readline())
+                if not reply.get('ok'):
+                    raise RuntimeError(reply.get('error', 'prettier worker failed'))
+            except (OSError, orjson.JSONDecodeError):
+                # Worker unavailable - fall back to the one-shot CLI
+                proc = await asyncio.create_subprocess_exec('prettier', '--write', input_file)
+                if await proc.wait() != 0:
+                    raise RuntimeError("prettier exited non-zero")
             return {"status": "success", "message": f"Formatted {input_file}"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    # ... [Previous handlers remain the same] ...
+    async def _handle_date_counting(self, task_description: str) -> Dict[str, Any]:
+        """A3: Count occurrences of a weekday in /data/dates.txt"""
+        try:
+            lower = task_description.lower()
+            day_name = next((name for name in _WEEKDAYS if name in lower), None)
+            if day_name is None:
+                return {"status": "error", "message": "No weekday found in task"}
 
-    # Phase B Task Handlers
-    async def _handle_api_fetch(self, task_description: str) -> Dict[str, Any]:
-        """B3: Fetch data from an API"""
+            input_file = '/data/dates.txt'
+            output_file = f'/data/dates-{day_name}s.txt'
+
+            import numpy as np
+
+            async with aiofiles.open(input_file) as f:
+                text = await f.read()
+            lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+            # Parse all dates in one vectorized pass; day 0 (1970-01-01) was
+            # a Thursday, so +3 maps the epoch offset onto Monday=0 weekdays
+            dates = np.array(lines, dtype='datetime64[D]')
+            count = int(((dates.astype('int64') + 3) % 7 == _WEEKDAYS[day_name]).sum())
+
+            async with aiofiles.open(output_file, 'w') as f:
+                await f.write(str(count))
+
+            return {"status": "success", "message": f"Counted {count} {day_name}s in {input_file}"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_json_sorting(self, task_description: str) -> Dict[str, Any]:
+        """A4: Sort contacts by last name, then first name"""
         try:
-            # Use LLM to extract API URL and parameters from task description
-            prompt = f"Extract the API URL and parameters from: {task_description}"
-            api_info = await self._handle_llm_request(prompt)
-            
-            # Make API request
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_info['url'], params=api_info.get('params', {})) as response:
-                    data = await response.json()
-                    
-                    # Save response to data directory
-                    output_file = '/data/api_response.json'
-                    with open(output_file, 'w') as f:
-                        json.dump(data, f, indent=2)
-                    
-                    return {"status": "success", "message": "API data fetched and saved"}
+            input_file = '/data/contacts.json'
+            output_file = '/data/contacts-sorted.json'
+
+            async with aiofiles.open(input_file, 'rb') as f:
+                contacts = orjson.loads(await f.read())
+
+            # itemgetter is C-implemented, so the sort key never re-enters
+            # the interpreter
+            contacts.sort(key=itemgetter('last_name', 'first_name'))
+
+            async with aiofiles.open(output_file, 'wb') as f:
+                await f.write(orjson.dumps(contacts, option=orjson.OPT_INDENT_2))
+
+            return {"status": "success", "message": f"Sorted contacts written to {output_file}"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    async def _handle_git_operations(self, task_description: str) -> Dict[str, Any]:
-        """B4: Clone repo and make commit"""
+    async def _handle_log_processing(self, task_description: str) -> Dict[str, Any]:
+        """A5: Write the first line of the 10 most recent .log files"""
         try:
-            # Extract repo URL and commit message from task description using LLM
-            prompt = f"Extract the git repository URL and commit message from: {task_description}"
-            git_info = await self._handle_llm_request(prompt)
-            
-            repo_path = '/data/git_repo'
-            repo = git.Repo.clone_from(git_info['url'], repo_path)
-            
-            # Make changes and commit
-            with open(f"{repo_path}/README.md", 'a') as f:
-                f.write("\nUpdated by LLM Agent")
-            
-            repo.index.add(['README.md'])
-            repo.index.commit(git_info['commit_message'])
-            
-            return {"status": "success", "message": "Git operations completed"}
+            log_dir = '/data/logs'
+            output_file = '/data/logs-recent.txt'
+
+            def collect() -> str:
+                # One scandir pass; entry.stat() reuses metadata the kernel
+                # already returned with the directory entry
+                entries = [
+                    (entry.stat().st_mtime, entry.path)
+                    for entry in os.scandir(log_dir)
+                    if entry.name.endswith('.log') and entry.is_file()
+                ]
+                entries.sort(reverse=True)
+                first_lines = []
+                for _, path in entries[:10]:
+                    # First line is at the head of the file; 512 bytes is enough
+                    with open(path, 'rb') as f:
+                        first_lines.append(
+                            f.read(512).split(b'\n', 1)[0].decode('utf-8', 'replace')
+                        )
+                return '\n'.join(first_lines) + '\n'
+
+            # The whole batch runs in one thread hop instead of blocking the
+            # event loop once per file
+            content = await asyncio.to_thread(collect)
+            async with aiofiles.open(output_file, 'w') as f:
+                await f.write(content)
+
+            return {"status": "success", "message": f"Wrote recent log lines to {output_file}"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    # ... Additional Phase B handlers ...
+    async def _handle_markdown_index(self, task_description: str) -> Dict[str, Any]:
+        """A6: Index the first H1 of every markdown file in /data/docs"""
+        try:
+            docs_dir = '/data/docs'
+            output_file = '/data/docs/index.json'
+
+            def build_index() -> bytes:
+                index = {}
+                # os.walk iterates via scandir; only the head of each file
+                # is read since the H1 sits near the top
+                for root, _, files in os.walk(docs_dir):
+                    for name in files:
+                        if not name.endswith('.md'):
+                            continue
+                        path = os.path.join(root, name)
+                        with open(path, encoding='utf-8', errors='replace') as f:
+                            head = f.read(4096)
+                        match = H1_RE.search(head)
+                        if match:
+                            index[os.path.relpath(path, docs_dir)] = match.group(1).strip()
+                return orjson.dumps(index, option=orjson.OPT_INDENT_2)
+
+            payload = await asyncio.to_thread(build_index)
+            async with aiofiles.open(output_file, 'wb') as f:
+                await f.write(payload)
+
+            return {"status": "success", "message": f"Markdown index written to {output_file}"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_markdown_conversion(self, task_description: str) -> Dict[str, Any]:
+        """B9: Convert a markdown file to HTML"""
+        try:
+            match = MD_PATH_RE.search(task_description)
+            if not match:
+                return {"status": "error", "message": "No markdown file path found in task"}
+            input_file = match.group()
+            output_file = os.path.splitext(input_file)[0] + '.html'
+
+            if not self._validate_path(input_file):
+                return {"status": "error", "message": "Markdown path must be under /data"}
+
+            import markdown2
+
+            async with aiofiles.open(input_file) as f:
+                text = await f.read()
+
+            html = await asyncio.to_thread(markdown2.markdown, text)
+
+            async with aiofiles.open(output_file, 'w') as f:
+                await f.write(html)
+
+            return {"status": "success", "message": f"HTML written to {output_file}"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_email_extraction(self, task_description: str) -> Dict[str, Any]:
+        """A7: Extract the sender's email address from /data/email.txt"""
+        try:
+            input_file = '/data/email.txt'
+            output_file = '/data/email-sender.txt'
+
+            async with aiofiles.open(input_file) as f:
+                text = await f.read()
+
+            # Prefer the From: header; fall back to the first address found
+            match = FROM_RE.search(text) or EMAIL_RE.search(text)
+            if not match:
+                return {"status": "error", "message": f"No email address found in {input_file}"}
+            sender = match.group(1) if match.re is FROM_RE else match.group()
+
+            async with aiofiles.open(output_file, 'w') as f:
+                await f.write(sender)
+
+            return {"status": "success", "message": f"Sender {sender} written to {output_file}"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_credit_card_extraction(self, task_description: str) -> Dict[str, Any]:
+        """A8: Extract the credit card number from /data/credit_card.png"""
+        try:
+            input_file = '/data/credit_card.png'
+            output_file = '/data/credit_card.txt'
+
+            async with aiofiles.open(input_file, 'rb') as f:
+                image_b64 = base64.b64encode(await f.read()).decode()
 
-    async def _handle_llm_request(self, prompt: str) -> str:
-        """Helper method to make LLM API requests"""
-        async with aiohttp.ClientSession() as session:
             headers = {
                 "Authorization": f"Bearer {self.ai_proxy_token}",
                 "Content-Type": "application/json"
             }
             data = {
                 "model": "gpt-4o-mini",
-                "messages": [{"role": "user", "content": prompt}]
+                "messages": [{"role": "user", "content": [
+                    {"type": "text", "text": "Read the card number in this image. Reply with the digits only."},
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_b64}"}}
+                ]}]
             }
-            async with session.post(
+            async with self._session.post(
                 "https://api.aiproxy.xyz/v1/chat/completions",
                 headers=headers,
                 json=data
             ) as response:
                 result = await response.json()
-                return result['choices'][0]['message']['content']
\ No newline at end of file
+            reply = result['choices'][0]['message']['content']
+
+            # Scan the reply with the precompiled pattern and keep the first
+            # candidate that passes the Luhn check
+            for match in CC_RE.finditer(reply):
+                digits = NON_DIGIT_RE.sub('', match.group())
+                if _luhn_valid(digits):
+                    async with aiofiles.open(output_file, 'w') as f:
+                        await f.write(digits)
+                    return {"status": "success", "message": f"Card number written to {output_file}"}
+
+            return {"status": "error", "message": "No valid card number found in image"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_comment_similarity(self, task_description: str) -> Dict[str, Any]:
+        """A9: Find the most similar pair of comments using embeddings"""
+        try:
+            input_file = '/data/comments.txt'
+            output_file = '/data/comments-similar.txt'
+
+            import numpy as np
+
+            async with aiofiles.open(input_file) as f:
+                text = await f.read()
+            comments = [line.strip() for line in text.splitlines() if line.strip()]
+            if len(comments) < 2:
+                return {"status": "error", "message": "Need at least two comments"}
+
+            # One batched embeddings request for all comments, then a single
+            # matrix product gives every pairwise cosine similarity at once
+            emb = await self._get_embeddings(comments)
+            emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+            sims = emb @ emb.T
+            np.fill_diagonal(sims, -np.inf)
+            i, j = np.unravel_index(sims.argmax(), sims.shape)
+
+            async with aiofiles.open(output_file, 'w') as f:
+                await f.write(f"{comments[i]}\n{comments[j]}\n")
+
+            return {"status": "success", "message": f"Most similar comments written to {output_file}"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_database_query(self, task_description: str) -> Dict[str, Any]:
+        """A10: Total sales for a ticket type in /data/ticket-sales.db"""
+        try:
+            db_file = '/data/ticket-sales.db'
+            lower = task_description.lower()
+            ticket_type = next(
+                (t for t in ("gold", "silver", "bronze") if t in lower), "gold"
+            )
+            output_file = f'/data/ticket-sales-{ticket_type}.txt'
+
+            def query():
+                conn = self._sqlite_connection(db_file)
+                # Connections are shared across requests, so serialize use
+                with self._sqlite_lock:
+                    row = conn.execute(
+                        "SELECT SUM(units * price) FROM tickets WHERE LOWER(type) = ?",
+                        (ticket_type,)
+                    ).fetchone()
+                return row[0] if row and row[0] is not None else 0
+
+            total = await asyncio.to_thread(query)
+            async with aiofiles.open(output_file, 'w') as f:
+                await f.write(str(total))
+
+            return {"status": "success", "message": f"Total {ticket_type} sales written to {output_file}"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _get_embeddings(self, texts: List[str]) -> Any:
+        """Fetch embeddings for all texts as one float32 array in a single batched API request."""
+        import numpy as np
+
+        headers = {
+            "Authorization": f"Bearer {self.ai_proxy_token}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": "text-embedding-3-small",
+            "input": texts
+        }
+        async with self._session.post(
+            "https://api.aiproxy.xyz/v1/embeddings",
+            headers=headers,
+            json=data
+        ) as response:
+            result = await response.json()
+        return np.array([item['embedding'] for item in result['data']], dtype=np.float32)
+
+    # ... [Previous handlers remain the same] ...
+
+    # Phase B Task Handlers
+    async def _handle_api_fetch(self, task_description: str) -> Dict[str, Any]:
+        """B3: Fetch data from an API"""
+        try:
+            # Use LLM to extract API URL(s) and parameters from task description
+            api_info = await self._extract_cached(task_description, EXTRACT_API_PROMPT)
+
+            urls = api_info.get('urls') or [api_info['url']]
+            params = api_info.get('params', {})
+
+            # Fetch all URLs concurrently on the shared session; the
+            # semaphore keeps a long pagination list from flooding the pool
+            sem = asyncio.Semaphore(32)
+
+            async def fetch_one(url):
+                async with sem:
+                    async with self._session.get(url, params=params) as response:
+                        return await response.json()
+
+            results = await asyncio.gather(*(fetch_one(url) for url in urls))
+            data = results[0] if len(results) == 1 else results
+
+            # Save response to data directory
+            output_file = '/data/api_response.json'
+            async with aiofiles.open(output_file, 'wb') as f:
+                await f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+            return {"status": "success", "message": "API data fetched and saved"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_git_operations(self, task_description: str) -> Dict[str, Any]:
+        """B4: Clone repo and make commit"""
+        try:
+            # Extract repo URL and commit message from task description using LLM
+            git_info = await self._extract_cached(task_description, EXTRACT_GIT_PROMPT)
+
+            repo_path = '/data/git_repo'
+
+            # Shallow single-branch clone: only the tip commit and the blobs
+            # actually checked out come over the wire
+            proc = await asyncio.create_subprocess_exec(
+                'git', 'clone', '--depth=1', '--single-branch', '--filter=blob:none',
+                git_info['url'], repo_path
+            )
+            if await proc.wait() != 0:
+                raise RuntimeError("git clone failed")
+
+            # Make changes and commit
+            async with aiofiles.open(f"{repo_path}/README.md", 'a') as f:
+                await f.write("\nUpdated by LLM Agent")
+
+            proc = await asyncio.create_subprocess_exec(
+                'git', '-C', repo_path, 'add', 'README.md'
+            )
+            if await proc.wait() != 0:
+                raise RuntimeError("git add failed")
+
+            # Fresh containers have no git identity configured; supply one
+            # inline or the commit exits 128
+            proc = await asyncio.create_subprocess_exec(
+                'git', '-C', repo_path,
+                '-c', 'user.name=LLM Agent',
+                '-c', 'user.email=agent@localhost',
+                'commit', '-m', git_info['commit_message']
+            )
+            if await proc.wait() != 0:
+                raise RuntimeError("git commit failed")
+
+            return {"status": "success", "message": "Git operations completed"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_csv_filtering(self, task_description: str) -> Dict[str, Any]:
+        """B10: Filter a CSV file and save matching rows as JSON"""
+        try:
+            # Use LLM to extract the file path, column and value to filter on
+            csv_info = await self._extract_cached(task_description, EXTRACT_CSV_PROMPT)
+
+            csv_file = csv_info['file']
+            column = csv_info['column']
+            value = csv_info['value']
+            output_file = '/data/csv_filtered.json'
+
+            if not self._validate_path(csv_file):
+                return {"status": "error", "message": "CSV path must be under /data"}
+
+            def filter_csv() -> int:
+                import pandas as pd
+
+                # Stream the file in chunks so non-matching rows are dropped
+                # as they are parsed instead of materializing the whole CSV
+                matched = [
+                    chunk[chunk[column].astype(str) == str(value)]
+                    for chunk in pd.read_csv(csv_file, chunksize=65536)
+                ]
+                result = pd.concat(matched) if matched else pd.DataFrame()
+                result.to_json(output_file, orient='records')
+                return len(result)
+
+            count = await asyncio.to_thread(filter_csv)
+            return {"status": "success", "message": f"Wrote {count} matching rows to {output_file}"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _handle_image_processing(self, task_description: str) -> Dict[str, Any]:
+        """B7: Compress or resize an image"""
+        try:
+            # Use LLM to extract the image path and target size
+            image_info = await self._extract_cached(task_description, EXTRACT_IMAGE_PROMPT)
+
+            input_file = image_info['file']
+            width = int(image_info.get('width', 800))
+            height = int(image_info.get('height', 800))
+
+            if not self._validate_path(input_file):
+                return {"status": "error", "message": "Image path must be under /data"}
+
+            stem, ext = os.path.splitext(input_file)
+            output_file = f"{stem}_processed{ext}"
+
+            def process():
+                from PIL import Image
+
+                with Image.open(input_file) as img:
+                    # draft() lets the JPEG decoder produce a reduced-size
+                    # image directly instead of decoding full resolution
+                    img.draft(img.mode, (width, height))
+                    img.thumbnail((width, height), Image.LANCZOS, reducing_gap=2.0)
+                    img.save(output_file, optimize=True)
+
+            # Pixel work runs in a worker thread off the event loop
+            await asyncio.to_thread(process)
+            return {"status": "success", "message": f"Processed image saved to {output_file}"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    # ... Additional Phase B handlers ...
+
+    async def _handle_llm_request(self, prompt: str, system: str = None,
+                                  parse_json: bool = False) -> Any:
+        """Helper method to make LLM API requests"""
+        cache_key = f"{system}\x00{prompt}" if system else prompt
+        cached = self._llm_cache.get(cache_key)
+        if cached is not None:
+            self._llm_cache.move_to_end(cache_key)
+            return _first_json_object(cached) if parse_json else cached
+
+        # Static system prefix goes first so the provider's prefix cache
+        # can reuse its KV state across calls
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+
+        headers = {
+            "Authorization": f"Bearer {self.ai_proxy_token}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": "gpt-4o-mini",
+            "messages": messages,
+            "stream": True
+        }
+        parts = []
+        async with self._session.post(
+            "https://api.aiproxy.xyz/v1/chat/completions",
+            headers=headers,
+            json=data
+        ) as response:
+            # Surface 4xx/5xx before touching the stream - their bodies
+            # carry no data: lines and must never reach the cache
+            response.raise_for_status()
+            # SSE stream: tokens are consumed as they are generated instead
+            # of waiting for the full response body
+            async for raw_line in response.content:
+                line = raw_line.strip()
+                if not line.startswith(b'data:'):
+                    continue
+                payload = line[5:].strip()
+                if payload == b'[DONE]':
+                    break
+                delta = orjson.loads(payload)['choices'][0]['delta'].get('content')
+                if not delta:
+                    continue
+                parts.append(delta)
+                # For extraction prompts, return the moment the first JSON
+                # object closes - no need to drain the stream tail
+                if parse_json and '}' in delta and _first_json_object(''.join(parts)) is not None:
+                    break
+
+        content = ''.join(parts)
+        # An empty completion is a failure, not a response worth replaying
+        if content:
+            self._store_llm_response(cache_key, content)
+        return _first_json_object(content) if parse_json else content
\ No newline at end of file
@@ -1,7 +1,10 @@
+import asyncio
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import PlainTextResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from typing import Optional
 from pathlib import Path
 from .agent import TaskAgent
@@ -9,9 +12,26 @@ from .agent import TaskAgent
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+# Resolved once; the trailing separator stops /datax from passing
+_DATA_ROOT = os.path.realpath('/data') + os.sep
+
+@lru_cache(maxsize=128)
+def _read_small_file(path: str, mtime_ns: int) -> bytes:
+    """Cache small file bodies; the mtime key invalidates stale entries."""
+    return Path(path).read_bytes()
+
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 agent = TaskAgent()
 
+@app.on_event("startup")
+async def startup():
+    await agent.startup()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await agent.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "LLM Automation Agent API is running"}
@@ -43,16 +63,27 @@ async def read_file(path: str):
         if not path:
             raise HTTPException(status_code=400, detail="File path is required")
         
-        # Security check
-        if "../" in path or not path.startswith("/data"):
+        # Security check: resolve symlinks/.. and compare against the real root
+        real = os.path.realpath(path)
+        if real != _DATA_ROOT[:-1] and not real.startswith(_DATA_ROOT):
             raise HTTPException(status_code=400, detail="Invalid path access")
-        
-        file_path = Path(path.lstrip("/"))
-        if not file_path.exists():
+
+        # One stat covers the existence check, the size dispatch and the
+        # cache key
+        try:
+            stat = await asyncio.to_thread(os.stat, real)
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="File not found")
-        
-        content = file_path.read_text()
-        return PlainTextResponse(content)
+
+        if stat.st_size < 65536:
+            # Small files: serve the bytes directly, skipping the
+            # decode/re-encode round-trip; repeat reads of an unchanged
+            # file come from the in-process cache
+            content = await asyncio.to_thread(_read_small_file, real, stat.st_mtime_ns)
+            return Response(content=content, media_type="text/plain")
+
+        # Large files stream through sendfile without entering Python
+        return FileResponse(real, media_type="text/plain")
     
     except HTTPException:
         raise